@@ -164,7 +164,7 @@ def ShowAERONET(aeronet, time_ind=0):
     ax[1].axis('off')
     top = 0.95
     step = 0.05
-    ax[1].text(0,top+step,'AERONET {}-{}nm Data'.format(data_dir.split('\\')[-1][18:],wvl))
+    ax[1].text(0,top+step,'AERONET {}-{}nm Data'.format(os.path.basename(os.path.normpath(data_dir))[18:],wvl))
     ax[1].text(0,top-1*step,'Time: {}'.format(aeronet['datetime'][time_ind].isoformat()))
     
     ax[1].text(0,top-2*step,'    AOD_Fine: {:.3f}'.format(aeronet['aod_f'][time_ind]))
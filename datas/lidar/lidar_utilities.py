@@ -12,12 +12,35 @@ Editted and Implemented by Maurice Roots
 
 """
 # Data Rangling
-from scipy.interpolate import interp1d
 import pandas as pd
 import numpy as np
 
 #%% Function Space
 
+# Depolarization ratio of air vs wavelength (nm)
+_DEPOL_WL = np.array([200.,  205.,  210.,  215.,  220.,
+                       225.,  230.,  240.,  250.,  260.,
+                       270.,  280.,  290.,  300.,  310.,
+                       320.,  330.,  340.,  350.,  360.,
+                       370.,  380.,  390.,  400.,  450.,
+                       500.,  550.,  600.,  650.,  700.,
+                       800.,  850.,  900.,  950.,  1000.,
+                       1064.])
+
+_DEPOL_VAL = np.array([0.0454545,  0.0438372,  0.0422133,  0.0411272,  0.0400381,
+                       0.0389462,  0.0378513,  0.0367534,  0.0356527,  0.0345489,
+                       0.033996,   0.0328878,  0.0323326,  0.0317766,  0.0317766,
+                       0.0312199,  0.0306624,  0.0306624,  0.0301042,  0.0301042,
+                       0.0301042,  0.0295452,  0.0295452,  0.0295452,  0.0289855,
+                       0.028425,   0.028425,  0.0278638,  0.0278638,  0.0278638,
+                       0.0273018,  0.0273018,  0.0273018,  0.0273018,  0.0273018,
+                       0.0273018])
+
+# Rayleigh scattering cross section constants
+_NSTP2 = 2.54691e25**2 # molecular number density of air at STP, squared
+_RS_CONST = 24*np.pi**3
+_KB = 1.38064852e-23 # Boltzmann's Constant (m2 kg s-2 K-1)
+
 def SA76(zkm):
     # % [P,T,numberDensity] = SA76(zkm)
     # % Returns the pressure [Pa], T [K], numberDensity [m^-3] for the
@@ -65,18 +88,22 @@ def SA76(zkm):
     # numberDensity = P/(kB*T);
     return P,T
 
+def _beta_rayleigh_const(wavelength):
+    """wavelength-only factor of the Rayleigh backscatter coefficient, lambda in m"""
+    return 2.938e-32 * wavelength**(-4.0117)
+
 def calc_beta_rayleigh(wavelength, P, T, nanometers=True, hPa=True, celsius=True):
     if nanometers is True: wavelength = wavelength * 10**-9
-    if hPa is True: P *= 100
-    if celsius is True: T += 273.15
-    beta_rayleigh = 2.938e-32 * (P/T) * (wavelength**(-4.0117))
+    if hPa is True: P = P * 100
+    if celsius is True: T = T + 273.15
+    beta_rayleigh = _beta_rayleigh_const(wavelength) * (P/T)
     return beta_rayleigh
 
 def calc_number_density(pressure, temperature, celsius=True, hPa=True):
     """Calculate Number Density
 
         Input
-            pressure        -> array-like, profile of pressure
+            pressure        -> array-like, profile of pressure (Pa)
             temperature     -> array-like, profile of temperature
             celsius         -> True, Falce: option for Kelvin or Celius tempurature
 
@@ -84,47 +111,30 @@ def calc_number_density(pressure, temperature, celsius=True, hPa=True):
             number desnsity -> array-like, profile of number density (molecules / m^-3)
     """
 
-    kB = 1.38064852e-23 # (m2 kg s-2 K-1)
-    if celsius is True: temperature += 273.15
-    ND = pressure/(kB * temperature)
+    if celsius is True: temperature = temperature + 273.15
+    ND = pressure/(_KB * temperature)
     return ND
 
 def calc_index_refraction(wavelength):
     """the index of refraction of dry air at STP for wavelength lambda in nm"""
-    ior = 1.0 + (5791817.0/(238.0185 - (10**6)/wavelength**2)+167909.0/(57.362-(10**6)/wavelength**2))*1e-8
+    inv_l2 = 1.0e6/(wavelength*wavelength) # 1/lambda^2 in um^-2
+    ior = 1.0 + (5791817.0/(238.0185 - inv_l2)+167909.0/(57.362 - inv_l2))*1e-8
     return ior
 
 def calc_depol_ratio(wavelength):
-    """depolarization ratio of gases as a function of the wavelength lambda in nm"""
-
-    wavelengths = np.array([200.,  205.,  210.,  215.,  220.,
-                  225.,  230.,  240.,  250.,  260.,
-                  270.,  280.,  290.,  300.,  310.,
-                  320.,  330.,  340.,  350.,  360.,
-                  370.,  380.,  390.,  400.,  450.,
-                  500.,  550.,  600.,  650.,  700.,
-                  800.,  850.,  900.,  950.,  1000.,
-                  1064.])
-
-    depolarize = np.array([0.0454545,  0.0438372,  0.0422133,  0.0411272,  0.0400381,
-                  0.0389462,  0.0378513,  0.0367534,  0.0356527,  0.0345489,
-                  0.033996,   0.0328878,  0.0323326,  0.0317766,  0.0317766,
-                  0.0312199,  0.0306624,  0.0306624,  0.0301042,  0.0301042,
-                  0.0301042,  0.0295452,  0.0295452,  0.0295452,  0.0289855,
-                  0.028425,   0.028425,  0.0278638,  0.0278638,  0.0278638,
-                  0.0273018,  0.0273018,  0.0273018,  0.0273018,  0.0273018,
-                  0.0273018])
-
-    depol = interp1d(wavelengths,depolarize,kind='linear')(wavelength)
+    """depolarization ratio of gases as a function of the wavelength lambda in nm
+    (NaN outside the 200-1064 nm table)"""
+    depol = np.interp(wavelength, _DEPOL_WL, _DEPOL_VAL, left=np.nan, right=np.nan)
     return depol
 
 def calc_rayleigh_scat_cross(wavelength):
     """ Calculates the Rayleigh scattering cross section per molecule [m^-3] for lambda in nm.
     """
-    nstp = 2.54691e25
-    rs = (1e36*24*np.pi**3*(calc_index_refraction(wavelength)**2-1)**2)
-    rs /= (wavelength**4*nstp**2*(calc_index_refraction(wavelength)**2+2)**2)
-    rs *= ((6+3*calc_depol_ratio(wavelength))/(6-7*calc_depol_ratio(wavelength)))
+    n2 = calc_index_refraction(wavelength)**2
+    rho = calc_depol_ratio(wavelength)
+    rs = (1e36*_RS_CONST*(n2-1)**2)
+    rs /= (wavelength**4*_NSTP2*(n2+2)**2)
+    rs *= ((6+3*rho)/(6-7*rho))
     return rs
 
 def calc_rayleigh_extinction(wavelength, numberDensity):
@@ -142,27 +152,143 @@ def calc_rayleigh_extinction(wavelength, numberDensity):
 
 def calc_rayleigh_trans(rayleigh_extinction, altitude_profile, kilometers=True):
     """Calculates the Rayleigh Transmission Profile
+
+        Input
+            rayleigh_extinction -> array-like, rayleigh extinction profile (km^-1)
+            altitude_profile    -> array-like, altitude of each level (m, or km if kilometers is False)
+            kilometers          -> True, False: convert altitude_profile from m to km
+
+        Output
+            rayleigh trans      -> exp(-2 * sum(alpha[i] * (z[i] - z[i-1]))), integrated
+                                   along the last axis (one value per wavelength row)
+
+        Note: the integral is a right Riemann sum, np.dot(alpha[1:], np.diff(z)):
+        each level contributes its own extinction times the depth of the layer
+        below it. This is not the trapezoid rule (np.trapz). The old per-level
+        loop multiplied the whole profile by every layer depth, building
+        len(altitude)-1 copies of it and over-counting.
     """
+    rayleigh_extinction = np.asarray(rayleigh_extinction, dtype=float)
+    altitude_profile = np.asarray(altitude_profile, dtype=float)
     if kilometers is True: altitude_profile = altitude_profile / 1000
-    int_alpha = [rayleigh_extinction * (altitude_profile[i] - altitude_profile[i-1]) for i in np.arange(1, len(altitude_profile))]
-    # print(int_alpha)
-    rayleigh_trans = np.exp(-2 * np.sum(int_alpha))
+    int_alpha = np.dot(rayleigh_extinction[..., 1:], np.diff(altitude_profile))
+    rayleigh_trans = np.exp(-2 * int_alpha)
     return rayleigh_trans
 
 def calc_rayleigh_beta_dot_trans(wavelength, pressure, temperature, altitude, nanometers=True, kilometers=True, celsius=True):
-    beta = calc_beta_rayleigh(wavelength, pressure, temperature, nanometers=nanometers)
-    numberDensity = calc_number_density(pressure, temperature, celsius=celsius)
+    """Rayleigh backscatter, extinction and transmission for one or more wavelengths
+
+        Input
+            wavelength  -> float or array-like of shape (W,), wavelength(s) (nm)
+            pressure    -> array-like of shape (N,), profile of pressure
+            temperature -> array-like of shape (N,), profile of temperature
+            altitude    -> array-like of shape (N,), altitude profile
+
+        Output
+            dictionary of profiles; for an array of wavelengths "beta_rayleigh",
+            "alpha_rayleigh" and "beta_dot_trans" have shape (W, N) and
+            "trans_rayleigh" has shape (W,)
+    """
+    wavelength = np.asarray(wavelength, dtype=float)
+    multi = wavelength.ndim == 1
+    if multi:
+        wavelength = wavelength[:, None]
+        pressure = np.asarray(pressure, dtype=float)
+        temperature = np.asarray(temperature, dtype=float)
+    beta = calc_beta_rayleigh(wavelength, pressure, temperature, nanometers=nanometers, celsius=celsius)
+    numberDensity = calc_number_density(pressure * 100, temperature, celsius=celsius) # hPa -> Pa
     alpha = calc_rayleigh_extinction(wavelength, numberDensity)
     rayleigh_trans = calc_rayleigh_trans(alpha, altitude, kilometers=kilometers)
-    beta_dot_trans = beta * (rayleigh_trans**2)
+    trans2 = rayleigh_trans**2
+    if multi: trans2 = trans2[:, None]
+    beta_dot_trans = beta * trans2
     return {"beta_rayleigh":beta, "ND":numberDensity, "alpha_rayleigh":alpha, "trans_rayleigh":rayleigh_trans, "beta_dot_trans":beta_dot_trans}
 
 
+class RayleighModel:
+    """Rayleigh backscatter and extinction for fixed lidar wavelength(s)
+
+        All wavelength-only quantities (depolarization ratio, index of refraction,
+        scattering cross section, backscatter constant) are evaluated once here, so
+        beta_dot_trans only does elementwise math on each new profile.
+
+        Input
+            wavelength  -> float or array-like of shape (W,), wavelength(s) (nm)
+            nanometers  -> True, False: set False if wavelength is given in m
+    """
+
+    def __init__(self, wavelength, nanometers=True):
+        wavelength = np.asarray(wavelength, dtype=float)
+        if nanometers is False: wavelength = wavelength * 10**9
+        self.multi = wavelength.ndim == 1
+        if self.multi: wavelength = wavelength[:, None]
+        self.wavelength = wavelength
+        self.depol = calc_depol_ratio(wavelength)
+        self.ior = calc_index_refraction(wavelength)
+        self.scat_cross = calc_rayleigh_scat_cross(wavelength)
+        self.beta_const = _beta_rayleigh_const(wavelength * 10**-9)
+        # beta = beta_const*P/T = beta_const*kB*ND, and alpha [km^-1] = ND*scat_cross*1000
+        self._beta_per_nd = self.beta_const * _KB
+        self._alpha_per_nd = self.scat_cross * 1000
+
+    def beta_dot_trans(self, pressure, temperature, altitude, hPa=True, celsius=True, kilometers=True):
+        """Same outputs as calc_rayleigh_beta_dot_trans; the inputs are not modified"""
+        pressure = np.asarray(pressure, dtype=float)
+        temperature = np.asarray(temperature, dtype=float)
+        if hPa is True: pressure = pressure * 100
+        if celsius is True: temperature = temperature + 273.15
+        numberDensity = calc_number_density(pressure, temperature, celsius=False)
+        beta = self._beta_per_nd * numberDensity
+        alpha = self._alpha_per_nd * numberDensity
+        rayleigh_trans = calc_rayleigh_trans(alpha, altitude, kilometers=kilometers)
+        trans2 = rayleigh_trans**2
+        if self.multi: trans2 = trans2[:, None]
+        beta_dot_trans = beta * trans2
+        return {"beta_rayleigh":beta, "ND":numberDensity, "alpha_rayleigh":alpha, "trans_rayleigh":rayleigh_trans, "beta_dot_trans":beta_dot_trans}
+
+
+def make_rayleigh_pipeline(wavelength, nanometers=True):
+    """Returns fn(pressure, temperature, altitude, ...) for a fixed wavelength
+
+        The wavelength-only terms are evaluated once when the pipeline is made,
+        so the returned function can be called on every profile of a time series.
+    """
+    return RayleighModel(wavelength, nanometers=nanometers).beta_dot_trans
+
+
 def binned_alts(data_array, altitude, bins=np.arange(0, 15000, 100)):
-        data = pd.DataFrame({"data":data_array, "altitude":altitude})
-        data["Alt_Bins"] = pd.cut(altitude, bins=bins)
-        new = data.groupby("Alt_Bins").mean().reset_index()
-        return new
+    """Average a profile into altitude bins
+
+        Input
+            data_array  -> array-like, profile to average
+            altitude    -> array-like, altitude of each sample
+            bins        -> array-like, bin edges; bins are (edge[i], edge[i+1]] as in pd.cut
+
+        Output
+            DataFrame with one row per bin: "Alt_Bins" (interval), "data" and
+            "altitude" (bin means, NaN for empty bins)
+    """
+    dat = np.asarray(data_array, dtype=float)
+    alt = np.asarray(altitude, dtype=float)
+    edges = np.asarray(bins)
+    nbins = len(edges) - 1
+
+    idx = np.searchsorted(edges, alt, side="left") - 1
+    keep = (idx >= 0) & (idx < nbins) & np.isfinite(alt)
+    idx, dat, alt = idx[keep], dat[keep], alt[keep]
+
+    # NaN data are skipped by the mean, like groupby().mean()
+    valid = np.isfinite(dat)
+    counts = np.bincount(idx[valid], minlength=nbins)
+    sums = np.bincount(idx[valid], weights=dat[valid], minlength=nbins)
+    alt_counts = np.bincount(idx, minlength=nbins)
+    alt_sums = np.bincount(idx, weights=alt, minlength=nbins)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        new = pd.DataFrame({"Alt_Bins": pd.IntervalIndex.from_breaks(edges),
+                            "data": np.where(counts > 0, sums / counts, np.nan),
+                            "altitude": np.where(alt_counts > 0, alt_sums / alt_counts, np.nan)})
+    return new
 
 
 #%%
@@ -185,85 +311,85 @@ if __name__ == "__main__":
 
     # wavelength = 1064; pressure = sonde["PRES"]; temperature=sonde["TEMP"]; altitude=sonde["HGHT"]
 
-#%%
+    #%%
 
-# Needed Packages
-from datas.lidar import ceilometer
-import datas.lidar.lidar_utilities as lidar_utilities
-import matplotlib.pyplot as plt
-import numpy as np
-import pandas as pd
+    # Needed Packages
+    from datas.lidar import ceilometer
+    import datas.lidar.lidar_utilities as lidar_utilities
+    import matplotlib.pyplot as plt
+    import numpy as np
+    import pandas as pd
 
-figPath = r"C:\Users\Magnolia\OneDrive - UMBC\Class\Class 2022\Figures"
-dataPath = [r"C:\Users\Magnolia\OneDrive - UMBC\Class\Class 2022\PHYS 650\lidar\data\20200308_Catonsville-MD_CHM160112_000.nc"]
+    figPath = r"C:\Users\Magnolia\OneDrive - UMBC\Class\Class 2022\Figures"
+    dataPath = [r"C:\Users\Magnolia\OneDrive - UMBC\Class\Class 2022\PHYS 650\lidar\data\20200308_Catonsville-MD_CHM160112_000.nc"]
 
-# Unpacking the Ceilometer Data from the NetCDF file
-UMBC_ceilometer, files = ceilometer.importing_ceilometer(dataPath)
-RCS = UMBC_ceilometer["20200308_Catonsville-MD_CHM160112_000.nc"]["beta_raw"]
-altitude = UMBC_ceilometer["20200308_Catonsville-MD_CHM160112_000.nc"]["range"]
-datetime = UMBC_ceilometer["20200308_Catonsville-MD_CHM160112_000.nc"]["datetime"]
+    # Unpacking the Ceilometer Data from the NetCDF file
+    UMBC_ceilometer, files = ceilometer.importing_ceilometer(dataPath)
+    RCS = UMBC_ceilometer["20200308_Catonsville-MD_CHM160112_000.nc"]["beta_raw"]
+    altitude = UMBC_ceilometer["20200308_Catonsville-MD_CHM160112_000.nc"]["range"]
+    datetime = UMBC_ceilometer["20200308_Catonsville-MD_CHM160112_000.nc"]["datetime"]
 
-# Plotting the Ceilometer curtain with attributes
-parms = {"data": UMBC_ceilometer,
-          "ylims": [0, 5],
-          "yticks": np.arange(0.5, 5.1, 0.5),
-          "title": r"UMBC Lufft CHM15K",
-          "savefig": f"{figPath}\\UMBC_Ceilometer_20200508.png"}
+    # Plotting the Ceilometer curtain with attributes
+    parms = {"data": UMBC_ceilometer,
+              "ylims": [0, 5],
+              "yticks": np.arange(0.5, 5.1, 0.5),
+              "title": r"UMBC Lufft CHM15K",
+              "savefig": f"{figPath}\\UMBC_Ceilometer_20200508.png"}
 
-# ceilometer.plot(**parms)
+    # ceilometer.plot(**parms)
 
 
-#%%
+    #%%
 
-wavelength = 1064;
-pressure, temperature = SA76();
-rayleigh_beta_dot_trans = calc_rayleigh_beta_dot_trans(wavelength, pressure, temperature, altitude)
+    wavelength = 1064;
+    pressure, temperature = SA76();
+    rayleigh_beta_dot_trans = calc_rayleigh_beta_dot_trans(wavelength, pressure, temperature, altitude)
 
-#%%
+    #%%
 
-plt.figure(figsize=(5, 8))
-# plt.plot(pressure, altitude, label="SA76: Pressure (hPa)")
-plt.plot(temperature, altitude, label="SA76: Temperature (K)")
-plt.legend()
+    plt.figure(figsize=(5, 8))
+    # plt.plot(pressure, altitude, label="SA76: Pressure (hPa)")
+    plt.plot(temperature, altitude, label="SA76: Temperature (K)")
+    plt.legend()
 
-#%%
-print(datetime[600], datetime[900])
+    #%%
+    print(datetime[600], datetime[900])
 
-#%%
+    #%%
 
-RCS_avg = np.mean(UMBC_ceilometer["20200308_Catonsville-MD_CHM160112_000.nc"]["beta_raw"][:, 600:900], axis=1)
+    RCS_avg = np.mean(UMBC_ceilometer["20200308_Catonsville-MD_CHM160112_000.nc"]["beta_raw"][:, 600:900], axis=1)
 
-beta_trans = binned_alts(beta_dot_trans, altitude*1000, bins=np.arange(3500, 6000, 20))
+    beta_trans = binned_alts(beta_dot_trans, altitude*1000, bins=np.arange(3500, 6000, 20))
 
-beta_raw_avg = binned_alts(RCS_avg, UMBC_ceilometer["20200308_Catonsville-MD_CHM160112_000.nc"]["range"], bins=np.arange(3500, 6000, 20))
+    beta_raw_avg = binned_alts(RCS_avg, UMBC_ceilometer["20200308_Catonsville-MD_CHM160112_000.nc"]["range"], bins=np.arange(3500, 6000, 20))
 
-#%%
-plt.figure()
-plt.plot(np.abs(beta_trans["data"]), beta_raw_avg["data"] / (1000**2),  "ok")
-# plt.ylim(0, 0.05)
-# plt.xlim(5e-8, 7e-8)
+    #%%
+    plt.figure()
+    plt.plot(np.abs(beta_trans["data"]), beta_raw_avg["data"] / (1000**2),  "ok")
+    # plt.ylim(0, 0.05)
+    # plt.xlim(5e-8, 7e-8)
 
 
-#%%
+    #%%
 
-X, Y = (np.abs(beta_trans["data"].values.reshape(-1, 1)), beta_raw_avg["data"].values.reshape(-1,1))
+    X, Y = (np.abs(beta_trans["data"].values.reshape(-1, 1)), beta_raw_avg["data"].values.reshape(-1,1))
 
 
-#%%
-from sklearn.linear_model import LinearRegression
-reg = LinearRegression().fit(X, Y)
-print(reg.score(X, Y), reg.coef_, reg.intercept_)
+    #%%
+    from sklearn.linear_model import LinearRegression
+    reg = LinearRegression().fit(X, Y)
+    print(reg.score(X, Y), reg.coef_, reg.intercept_)
 
 
-#%%
-from scipy import stats
-res = stats.linregress(np.abs(beta_trans["data"]), beta_raw_avg["data"])
-print(res.rvalue, res.intercept, res.slope)
+    #%%
+    from scipy import stats
+    res = stats.linregress(np.abs(beta_trans["data"]), beta_raw_avg["data"])
+    print(res.rvalue, res.intercept, res.slope)
 
 
-#%%
-attenuated_backscatter = RCS_avg / res.slope
-plt.plot(attenuated_backscatter, UMBC_ceilometer["20200308_Catonsville-MD_CHM160112_000.nc"]["range"])
-plt.plot(np.abs(beta_dot_trans), altitude*1000, "k")
-# plt.ylim(0, 5000)
-# plt.xlim(0, 0.05)
\ No newline at end of file
+    #%%
+    attenuated_backscatter = RCS_avg / res.slope
+    plt.plot(attenuated_backscatter, UMBC_ceilometer["20200308_Catonsville-MD_CHM160112_000.nc"]["range"])
+    plt.plot(np.abs(beta_dot_trans), altitude*1000, "k")
+    # plt.ylim(0, 5000)
+    # plt.xlim(0, 0.05)
\ No newline at end of file
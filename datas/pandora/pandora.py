@@ -16,33 +16,99 @@ import matplotlib.dates as mdates
 from datetime import datetime
 import matplotlib.dates as mdates
 
+# Pandonia timestamps, e.g. 20171222T125938.8Z (UTC)
+PANDONIA_TIME_FORMAT = "%Y%m%dT%H%M%S.%fZ"
+
+class PandoraPlotter:
+    """Quick-look figure for pandonia.plot
+
+    Keeps one figure and its axes and clears them on every call, so plotting
+    many Pandora files in a row does not build a new Figure each time. If the
+    figure was closed (window closed, or the inline backend closing it after
+    plt.show()), a new one is made so the next plot is still displayed.
+    """
+    def __init__(self):
+        self.new_figure()
+
+    def new_figure(self):
+        self.fig, (self.ax1, self.ax3) = plt.subplots(2, 1)
+        self.ax2 = self.ax1.twinx()
+        self.ax4 = self.ax3.twinx()
+
+    def clear(self):
+        if not plt.fignum_exists(self.fig.number):
+            self.new_figure()
+            return
+        for ax in (self.ax1, self.ax2, self.ax3, self.ax4): ax.cla()
+        # cla() moves the twin y-labels back to the left
+        for ax in (self.ax2, self.ax4): ax.yaxis.set_label_position('right')
+
+    def plot(self, uL, title, mol=None):
+        self.clear()
+        fig, ax1, ax2, ax3, ax4 = self.fig, self.ax1, self.ax2, self.ax3, self.ax4
+        # Rasterize dense series so vector outputs stay small
+        rasterized = len(uL) > 10000
+
+        color = 'blue'
+        ax1.plot(uL[0], uL[8], '.', markersize=1, color='b', rasterized=rasterized)
+        ax1.set_title(f"{title}")
+        ax1.set_ylabel('Uncertainty (DU)', color=color)
+        ax1.tick_params(axis='y', labelcolor=color)
+        ax1.grid(True)
+
+        color = 'red'
+        ax2.plot(uL[0], uL[7], '.', markersize=1, color=color, label='Data', rasterized=rasterized)
+        ax2.set_ylabel('Total Column (DU)', color=color)
+        ax2.xaxis.set_major_formatter(mdates.DateFormatter("(%Hh)"))
+        ax2.tick_params(axis='y', labelcolor=color)
+        if type(mol) is str: ax2.legend([mol])
+
+
+        fig.tight_layout()  # otherwise the right y-label is slightly clipped
+
+        color = 'tab:blue'
+        ax3.plot(uL[0], uL[3],'.', markersize=1, color=color, rasterized=rasterized)
+        ax3.set_xlabel('Datetime UTC')
+        ax3.set_ylabel('SZA (degrees)', color=color)
+        ax3.tick_params(axis='y', labelcolor=color)
+
+        color = 'green'
+        ax4.plot(uL[0], uL[4],'.', markersize=1, color=color, rasterized=rasterized)
+        ax4.xaxis.set_major_formatter(mdates.DateFormatter("%m-%d"))
+        ax4.set_ylabel('SAA (degrees)', color=color)
+        ax4.tick_params(axis='y', labelcolor=color)
+        ax3.grid(True)
+        return fig
+
 class pandonia:
     def clean(df, value=12):
-            df.loc[df[11] >= value, [7, 8, 9, 10]] = np.nan
-            # df.loc[df[22] >= 1, [7:10]] = np.nan
-            df.loc[df[18] >= value, [14, 15, 16, 17]] = np.nan
-            return df
+        bad = df[11].to_numpy() >= value
+        df[[7, 8, 9, 10]] = np.where(bad[:, None], np.nan, df[[7, 8, 9, 10]].to_numpy())
+        # df.loc[df[22] >= 1, [7:10]] = np.nan
+        bad = df[18].to_numpy() >= value
+        df[[14, 15, 16, 17]] = np.where(bad[:, None], np.nan, df[[14, 15, 16, 17]].to_numpy())
+        return df
 
     def flt_by_date(df, date1, date2):
         if df.empty: print('Input dataframe is empty'); return
         mask = (df[0] >= date1) & (df[0] <= date2)
-        uL = df.loc[mask]
-        if uL.empty: print('Specified dates are not found \n',
+        if not mask.any(): print('Specified dates are not found \n',
                                     f'Dataframe only provides {df[0].iloc[0]} to {df[0].iloc[-1]}'); return
-        return uL
+        return df.loc[mask]
 
     def flt(df, column, val_1, val_2):
         if df.empty: print('Input dataframe is empty'); return
         mask = (df[column] >= val_1) & (df[column] <= val_2)
-        uL = df.loc[mask]
-        if uL.empty: print('Specified values are not found \n'); return
-        return uL
+        if not mask.any(): print('Specified values are not found \n'); return
+        return df.loc[mask]
 
-    def plot(dataframe, mol=None, flt='on', title=None, savpath=None):
+    def plot(dataframe, mol=None, flt='on', title=None, savpath=None, dpi=150, plotter=None):
         '''### Description ###
         # dataframe -> enter pandas data frame
         # start     -> enter starting date (or datetime) as string
         # stop      -> ente stoping date (or datetime) as string
+        # dpi       -> resolution of the saved figure
+        # plotter   -> PandoraPlotter to draw into (reused across calls); a new one if None
         # fig'''
 
         if mol and type(mol) is not str: print('Molecule type must be a string value')
@@ -64,46 +130,14 @@ class pandonia:
         if not title:
             title = savnam
 
-        fig, (ax1, ax3) = plt.subplots(2, 1)
-        color = 'blue'
-        ax1.plot(uL[0], uL[8], '.', markersize=1, color='b')
-        ax1.set_title(f"{title}")
-        ax1.set_ylabel('Uncertainty (DU)', color=color)
-        ax1.tick_params(axis='y', labelcolor=color)
-        ax1.grid(True)
-
-        ax2 = ax1.twinx()
-
-        color = 'red'
-        ax2.plot(uL[0], uL[7], '.', markersize=1, color=color, label='Data')
-        ax2.set_ylabel('Total Column (DU)', color=color)
-        ax2.xaxis.set_major_formatter(mdates.DateFormatter("(%Hh)"))
-        ax2.tick_params(axis='y', labelcolor=color)
-        if type(mol) is str: ax2.legend([mol])
-
-
-        fig.tight_layout()  # otherwise the right y-label is slightly clipped
-
-        color = 'tab:blue'
-        ax3.plot(uL[0], uL[3],'.', markersize=1, color=color)
-        ax3.set_xlabel('Datetime UTC')
-        ax3.set_ylabel('SZA (degrees)', color=color)
-        ax3.tick_params(axis='y', labelcolor=color)
-
-        ax4 = ax3.twinx()
-
-        color = 'green'
-        ax4.plot(uL[0], uL[4],'.', markersize=1, color=color)
-        ax4.xaxis.set_major_formatter(mdates.DateFormatter("%m-%d"))
-        ax4.set_ylabel('SAA (degrees)', color=color)
-        ax4.tick_params(axis='y', labelcolor=color)
-        ax3.grid(True)
-        if savpath: fig.savefig(f"{savpath}\QuickPlot_{savnam}.png", dpi=600)
-        if not savpath: fig.savefig(f"QuickPlot_{savnam}.png", dpi=600)
+        if plotter is None: plotter = PandoraPlotter()
+        fig = plotter.plot(uL, title, mol=mol)
+        if savpath: fig.savefig(os.path.join(savpath, f"QuickPlot_{savnam}.png"), dpi=dpi)
+        if not savpath: fig.savefig(f"QuickPlot_{savnam}.png", dpi=dpi)
         plt.show()
         return uL
 
-    def plot_by_date(dataframe, start, stop, mol=None, flt='off', title=None, savpath=None):
+    def plot_by_date(dataframe, start, stop, mol=None, flt='off', title=None, savpath=None, dpi=150, plotter=None):
         '''### Description ###
         # dataframe -> enter pandas data frame
         # start     -> enter starting date (or datetime) as string
@@ -122,33 +156,29 @@ class pandonia:
         title1 = title
         savpath1 = savpath
         mol1 = mol
-        pandonia.plot(uL, mol=mol1, title=title1, savpath=savpath1)
+        pandonia.plot(uL, mol=mol1, title=title1, savpath=savpath1, dpi=dpi, plotter=plotter)
         return uL
 
     def importing(Path, par=None, date_start=None, date_stop=None):
         uL = {}
         uL_head = {}
         print(f'Importing Panodnia Data from {Path} \n')
-        for filename in glob.glob(os.path.join(Path, '*.txt')):
-            """Search for the given string in file and return lines containing that string,
-            along with line numbers"""
-            nlines = 0
-            cells = []
-            # Open the file in read only mode
+        for filename in glob.iglob(os.path.join(Path, '*.txt')):
+            fname = os.path.basename(filename)
             with open(filename, 'r') as f:
-                for line in f:   # Read all lines in the file one by one
-                    nlines += 1
+                # Header runs up to the second '---' line; the data follows it
+                header = []
+                cells = []
+                while len(cells) < 2:
+                    line = f.readline()
+                    if not line: break
                     if '---' in line:
-                        cells.append(nlines-1)    # If yes, then add the line number
-                f.close()
-            with open(os.path.join(Path, filename), 'r') as f: # open in readonly mode
-                uL_head[filename.split('\\')[-1]] = pd.read_csv(f, sep="\n",
-                                                                              header=None, nrows=cells[1], low_memory=False)
-                f.close()
-            with open(os.path.join(Path, filename), 'r') as f:
-                uL[filename.split('\\')[-1]] = pd.read_csv(f, sep=" ", parse_dates=[0], header=None, skiprows=cells[1]+1, low_memory=False)
-                print(filename.split('\\')[-1], '\t -> Loaded')
-                f.close()
+                        cells.append(len(header))
+                    header.append(line.rstrip('\n'))
+                uL_head[fname] = pd.DataFrame(header[:cells[1]])
+                uL[fname] = pd.read_csv(f, sep=" ", header=None, engine='c', low_memory=False)
+            uL[fname][0] = pd.to_datetime(uL[fname][0], format=PANDONIA_TIME_FORMAT, utc=True)
+            print(fname, '\t -> Loaded')
 
         name = list(uL.keys())
 
@@ -159,8 +189,9 @@ class pandonia:
                         uL[i] = pandonia.flt_by_date(uL[i], date_start, date_stop)
             if 'plot' in par:
                 if 'filter on' in par: flt1='on'
+                plotter = PandoraPlotter()
                 for i in name:
-                    uL[i] = pandonia.plot(uL[i], flt=flt1)
+                    uL[i] = pandonia.plot(uL[i], flt=flt1, plotter=plotter)
 
         return uL, uL_head, name
 
@@ -25,29 +25,27 @@ class CFH:
         uL = {}
         uL_head = {}
         print(f'Importing CFH Sonde data from {data_path} \n')
-        for filename in glob.glob(os.path.join(data_path, '*.dat')):
-            """Search for the given string in file and return lines containing that string,
-            along with line numbers"""
+        for filename in glob.iglob(os.path.join(data_path, '*.dat')):
+            fname = os.path.basename(filename)
+            # The data start line is given on the second line of the file
             with open(filename, 'r') as f:
-                lines_to_read = [1]
-                for position, line in enumerate(f):
-                    if position in lines_to_read:
-                        start = int(line.split('= ')[-1])
+                f.readline()
+                start = int(f.readline().split('= ')[-1])
 
-            with open(os.path.join(data_path, filename), 'r') as f:
-                uL_head[filename.split('\\')[-1]] = pd.read_csv(f, sep="\n",
+            with open(filename, 'r') as f:
+                uL_head[fname] = pd.read_csv(f, sep="\n",
                     header=None, nrows=start-3, low_memory=False)
                 f.close()
 
-            with open(os.path.join(data_path, filename), 'r') as f:
+            with open(filename, 'r') as f:
                 uL_columns = pd.read_csv(f, sep=",", header=None, skiprows=start-2, nrows=2, skipinitialspace=True, low_memory=False)
                 uL_c = list(uL_columns.loc[0] + uL_columns.loc[1])
                 f.close()
 
-            with open(os.path.join(data_path, filename), 'r') as f:
-                uL[filename.split('\\')[-1]] = pd.read_csv(f, sep=",", names=uL_c, skiprows=start, low_memory=False)
-                if clean == True: uL[filename.split('\\')[-1]] = CFH.clean(uL[filename.split('\\')[-1]], 'O3 Mr[ppmv]')
-                print(filename.split('\\')[-1], '\t -> Loaded')
+            with open(filename, 'r') as f:
+                uL[fname] = pd.read_csv(f, sep=",", names=uL_c, skiprows=start, low_memory=False)
+                if clean == True: uL[fname] = CFH.clean(uL[fname], 'O3 Mr[ppmv]')
+                print(fname, '\t -> Loaded')
                 f.close()
 
         names = list(uL.keys())
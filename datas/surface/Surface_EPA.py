@@ -10,9 +10,13 @@ import numpy as np
 import pandas as pd
 import matplotlib as plt
 from pathlib import Path
-import copy
 from tqdm import tqdm
 
+# Columns of the AQS hourly files used downstream, and their types
+EPA_COLUMNS = ["Site Num", "Sample Measurement", "State Name", 'Latitude', 'Longitude', "Date GMT", 'Time GMT']
+EPA_DTYPES = {"Site Num": "int64", "Sample Measurement": "float64", "State Name": str,
+              'Latitude': "float64", 'Longitude': "float64", "Date GMT": str, 'Time GMT': str}
+
 def debug(func):
     def wrapper(*args, **kwargs):
         print('*' * 80)
@@ -30,18 +34,22 @@ class Surface_EPA:
     
     @staticmethod
     def import_EPA_zip_single(filename, **kwargs):
-        return pd.read_csv(filename, compression="zip", low_memory=False)
+        kwargs.setdefault("usecols", EPA_COLUMNS)
+        kwargs.setdefault("dtype", EPA_DTYPES)
+        kwargs.setdefault("low_memory", False)
+        return pd.read_csv(filename, compression="zip", engine="c", **kwargs)
 
     @classmethod
     def EPA_zip_to_parquet(cls, filename, **kwargs):
+        # Archive every AQS column; read_EPA_parquet narrows to EPA_COLUMNS on read
+        kwargs.setdefault("usecols", None)
         data = cls.import_EPA_zip_single(filename, **kwargs)
         data.to_parquet(path=(str(filename) + ".gzip"), compression='gzip')
         return
     
     @staticmethod
     def read_EPA_parquet(filename):
-        cols = ["Site Num", "Sample Measurement", "State Name", 'Latitude', 'Longitude', "Date GMT", 'Time GMT']
-        return pd.read_parquet((str(filename) + ".gzip"), engine="fastparquet", columns=cols)
+        return pd.read_parquet((str(filename) + ".gzip"), engine="fastparquet", columns=EPA_COLUMNS)
     
     def import_EPA_parquets(self, filenames, loading=True):
         self.data = {}; self.sites = {}
@@ -60,13 +68,13 @@ class Surface_EPA:
     def select_state(df, state_name='Maryland', **kwargs):
         try: 
             # Grab only the site within the given state
-            state = copy.deepcopy(df[df["State Name"] == state_name])
+            state = df[df["State Name"].to_numpy() == state_name].copy()
 
             # Grab the Site Number and Location of Monitoring sites in 
             state_sites = state.drop(columns=state.columns.difference(['Site Num', 'Latitude', 'Longitude'])).drop_duplicates()
 
             # Creating a timestamp column in GMT
-            state["Timestamp GMT"] = pd.to_datetime((state["Date GMT"] + ' ' + state['Time GMT']), utc=True)
+            state["Timestamp GMT"] = pd.to_datetime((state["Date GMT"] + ' ' + state['Time GMT']), format="%Y-%m-%d %H:%M", utc=True)
 
             # Create a Datetime and Site Number index for the series (MultiIndexed)
             state.set_index(["Site Num", "Timestamp GMT"], inplace=True)
@@ -110,26 +118,40 @@ class Surface_EPA:
         data = {}
         state.sort_index(inplace=True)
         
+        values = state["Sample Measurement"]
+        times = state.index.get_level_values("Timestamp GMT")
+        seconds = times.hour * 3600 + times.minute * 60 + times.second
+        
+        # Select data between 10am-3pm for diurnal and 8pm-3am for nocturnal (inclusive, as between_time)
+        is_diurnal = (seconds >= 10 * 3600) & (seconds <= 15 * 3600)
+        is_nocturnal = (seconds >= 20 * 3600) | (seconds <= 3 * 3600)
+        
+        # One groupby over (site, day) for all sites instead of resampling each site
+        keys = [state.index.get_level_values("Site Num"), times.floor("D")]
+        diurnal = values[is_diurnal].groupby([key[is_diurnal] for key in keys]).agg(["mean", "std", "max"])
+        nocturnal = values[is_nocturnal].groupby([key[is_nocturnal] for key in keys]).agg(["mean", "std", "min"])
+        daily = pd.DataFrame({
+            "Diurnal Mean": diurnal["mean"],
+            "Nocturnal Mean": nocturnal["mean"],
+            "Diurnal STD": diurnal["std"],
+            "Nocturnal STD": nocturnal["std"],
+            "Diurnal Max": diurnal["max"],
+            "Nocturnal Min": nocturnal["min"]
+        })
+        
         sites = state_sites["Site Num"]
         
         if loading:
             print("Calculating Diurnal and Nocturnal Averages by Sites")
             sites = tqdm(sites)
             
+        # Sites with no samples in either window get an empty frame
+        has_data = set(daily.index.get_level_values(0))
+        empty = daily.iloc[:0].droplevel(0)
+        
         for site in sites:
-            # Select data between 10am-3pm for diurnal mean
-            diurnal = state.loc[(site, ), "Sample Measurement"].between_time("10:00", "15:00")
-            # Select data between 8pm-3am for nocturnal mean
-            nocturnal = state.loc[(site, ), "Sample Measurement"].between_time("20:00", "03:00")
-            # Compute diurnal and nocturnal means, standard deviations, maximums, and minimums using resampling
-            data[str(site)] = pd.DataFrame({
-                "Diurnal Mean": diurnal.resample("D").mean(),
-                "Nocturnal Mean": nocturnal.resample("D").mean(),
-                "Diurnal STD": diurnal.resample("D").std(),
-                "Nocturnal STD": nocturnal.resample("D").std(),
-                "Diurnal Max": diurnal.resample("D").max(),
-                "Nocturnal Min": nocturnal.resample("D").min()
-            })
+            # Fill missing days with NaN, as resample("D") did
+            data[str(site)] = daily.loc[site].asfreq("D") if site in has_data else empty.copy()
         return data
     
     def diurnal_nocturnal_means(self, rm_nan=True, loading=True):
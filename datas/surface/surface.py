@@ -114,14 +114,16 @@ filtered_df = filter_by_borders(df, lat_min, lat_max, lon_min, lon_max)
 def create_nested_dict(df):
     # Initialize empty dictionary
     nested_dict = {}
+    params = [param for param in df.columns if param not in ['State Name', 'County Name', 'Site Num', 'Date Local']]
 
-    # Group DataFrame by state and site
-    grouped_df = df.groupby(['State Name', 'Site Num'])
+    # Group DataFrame by state and site; sort=False keeps states and sites in order of first appearance
+    grouped_df = df.groupby(['State Name', 'Site Num'], sort=False)
 
     # Iterate over groups
     for (state, site), site_df in grouped_df:
-        # Create site dictionary using dictionary comprehension
-        site_dict = {row['Date Local']: {param: row[param] for param in df.columns if param not in ['State Name', 'County Name', 'Site Num', 'Date Local']} for _, row in site_df.iterrows()}
+        # Create site dictionary keyed by date (last row wins for repeated dates)
+        site_df = site_df[~site_df['Date Local'].duplicated(keep='last')]
+        site_dict = site_df.set_index('Date Local')[params].to_dict('index')
 
         # Add site dictionary to state dictionary
         if state not in nested_dict:
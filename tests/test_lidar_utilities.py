@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from datas.lidar.lidar_utilities import (SA76, RayleighModel, calc_rayleigh_beta_dot_trans,
+                                         calc_rayleigh_trans, make_rayleigh_pipeline)
+
+
+def test_calc_rayleigh_trans_is_right_riemann_sum():
+    z = np.array([0.0, 1000.0, 3000.0]) # m
+    ext = np.array([0.5, 0.2, 0.1]) # km^-1
+    # layers of 1 km and 2 km, each taking the extinction at its top level
+    assert np.isclose(calc_rayleigh_trans(ext, z), np.exp(-2 * (0.2 * 1.0 + 0.1 * 2.0)))
+
+
+def test_calc_rayleigh_trans_does_not_overcount():
+    z = np.array([0.0, 1000.0, 3000.0])
+    ext = np.array([0.5, 0.2, 0.1])
+    # the old loop integrated to sum(ext) * (z[-1] - z[0])
+    old = np.exp(-2 * ext.sum() * 3.0)
+    assert not np.isclose(calc_rayleigh_trans(ext, z), old)
+
+
+def test_calc_rayleigh_trans_kilometers_flag():
+    z = np.array([0.0, 1.0, 3.0]) # km
+    ext = np.array([0.5, 0.2, 0.1])
+    expected = np.exp(-2 * (0.2 * 1.0 + 0.1 * 2.0))
+    assert np.isclose(calc_rayleigh_trans(ext, z, kilometers=False), expected)
+
+
+def test_calc_rayleigh_trans_per_wavelength_row():
+    z = np.array([0.0, 500.0, 1500.0])
+    ext = np.array([[0.3, 0.2, 0.1], [0.03, 0.02, 0.01]])
+    trans = calc_rayleigh_trans(ext, z)
+    assert trans.shape == (2,)
+    assert np.isclose(trans[1], np.exp(-2 * (0.02 * 0.5 + 0.01 * 1.0)))
+
+
+def _sa76_profile():
+    z = np.linspace(0, 10000, 50) # m
+    P, T = SA76(z / 1000)
+    return P / 100, T, z # hPa, K, m
+
+
+@pytest.mark.parametrize("wavelength", [532.0, np.array([355.0, 532.0, 1064.0])])
+@pytest.mark.parametrize("celsius", [True, False])
+def test_rayleigh_model_matches_function(wavelength, celsius):
+    pressure, temperature, z = _sa76_profile()
+    if celsius: temperature = temperature - 273.15
+    expected = calc_rayleigh_beta_dot_trans(wavelength, pressure, temperature, z, celsius=celsius)
+    result = RayleighModel(wavelength).beta_dot_trans(pressure, temperature, z, celsius=celsius)
+    pipeline = make_rayleigh_pipeline(wavelength)(pressure, temperature, z, celsius=celsius)
+    for key in expected:
+        assert np.allclose(result[key], expected[key])
+        assert np.allclose(pipeline[key], expected[key])
+
+
+def test_rayleigh_model_leaves_inputs_unchanged():
+    pressure, temperature, z = _sa76_profile()
+    p0, t0 = pressure.copy(), temperature.copy()
+    RayleighModel(532.0).beta_dot_trans(pressure, temperature, z, celsius=False)
+    calc_rayleigh_beta_dot_trans(532.0, pressure, temperature, z, celsius=False)
+    assert np.array_equal(pressure, p0) and np.array_equal(temperature, t0)